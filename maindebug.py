@@ -1,12 +1,23 @@
 import pygame
 import json
 import os
+import functools
+import time
 from datetime import datetime
 import sqlite3
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional, the physics step then runs as regular Python
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that leaves the decorated function untouched."""
+        return lambda function: function
 
 # Define the root directory
 ROOT_DIR = os.path.dirname(__file__)  # Automatically gets the script's directory
 LEVEL_PATH = os.path.join(ROOT_DIR, 'level.json')  # Relative path to the file
+DB_PATH = os.path.join(ROOT_DIR, 'score.db')  # Scores database next to the script
 # === Constants === #
 WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600  # Viewport dimensions
 WORLD_WIDTH, WORLD_HEIGHT = 4096, 2048  # World dimensions
@@ -17,8 +28,19 @@ COLORS = {
     "platform": (0, 255, 0),  # Green platforms
     "background": (0, 0, 0),  # Black background
     "border": (255, 255, 0),  # Bright yellow borders
+    "invincible": (255, 255, 0),  # Yellow player flash while invincible
+    "coin": (255, 215, 0),  # Gold coins
+    "damage_brick": (255, 0, 0),  # Red damage bricks
 }
 
+# Controls (bound once so input handling skips the pygame attribute lookups)
+KEY_LEFT = pygame.K_LEFT
+KEY_LEFT_ALT = pygame.K_a
+KEY_RIGHT = pygame.K_RIGHT
+KEY_RIGHT_ALT = pygame.K_d
+KEY_JUMP = pygame.K_SPACE
+KEY_DASH = pygame.K_LSHIFT
+
 # Player stats
 PLAYER_STATS = {
     "size": 16,  # Player dimensions
@@ -29,198 +51,314 @@ PLAYER_STATS = {
     "jump_force": -5,  # Jump force (upward velocity)
 }
 
+PLAYER_SIZE = PLAYER_STATS["size"]  # Plain constant for the compiled physics step
+
+# Player state flags, packed into the bits of Player.flags
+FLAG_DASHING = 1 << 0  # Player is currently dashing
+FLAG_GROUNDED = 1 << 1  # Player stands on a platform or the floor
+FLAG_FACING_RIGHT = 1 << 2  # Last facing direction
+FLAG_DASH_KEY = 1 << 3  # Dash key is held (a dash needs a new press)
+FLAG_INVINCIBLE = 1 << 4  # Player was just damaged and ignores further damage
+
 GRAVITY = 0.2
 MAX_FALL_SPEED = 10
 BORDER_THICKNESS = 5  # Thickness of the borders
+HUD_AREA = (0, 0, 240, 100)  # Screen region covered by the score and health bar
+GRID_CELL_SIZE = 64  # Cell size of the collision spatial hash grid
 
 # === Classes === #
-class Platform:
+class WorldSprite(pygame.sprite.DirtySprite):
+    """A static object in the world, drawn through a LayeredDirty group.
+
+    world_rect is its position in the world (used for collisions); rect is its position
+    on screen and only changes when the camera scrolls.
+    """
+    def __init__(self, world_rect, image):
+        super().__init__()
+        self.world_rect = world_rect
+        self.rect = world_rect.copy()
+        self.image = image
+        self.visible = 0  # Shown once the camera scrolls it into view
+        self.dirty = 0  # Static, only redrawn when the area beneath it is repainted
+
+class Platform(WorldSprite):
     """Represents a platform in the game."""
     def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
+        super().__init__(pygame.Rect(x, y, width, height), get_solid_surface((width, height), COLORS["platform"]))
+
+class SpatialHashGrid:
+    """Buckets static rectangles into grid cells so overlap checks only touch nearby objects."""
+    def __init__(self, rects, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> indices of the rects overlapping that cell
+        for index, rect in enumerate(rects):
+            # Zero-sized rects still occupy the cell they sit in
+            right = max(rect.right - 1, rect.left)
+            bottom = max(rect.bottom - 1, rect.top)
+            for cell in self._cells_between(rect.left, rect.top, right, bottom):
+                self.cells.setdefault(cell, []).append(index)
+
+    def _cells_between(self, left, top, right, bottom):
+        """Yields the coordinates of every cell covering the given (inclusive) bounds."""
+        size = self.cell_size
+        for cell_x in range(left // size, right // size + 1):
+            for cell_y in range(top // size, bottom // size + 1):
+                yield cell_x, cell_y
+
+    def query(self, rect, margin=0):
+        """Returns the sorted indices of all rects sharing a cell with (or touching) the given rect.
+
+        margin grows the searched area on every side, e.g. to cover movement still to come.
+        """
+        candidates = set()
+        for cell in self._cells_between(rect.left - margin, rect.top - margin, rect.right + margin, rect.bottom + margin):
+            bucket = self.cells.get(cell)
+            if bucket:
+                candidates.update(bucket)
+        return sorted(candidates)  # Keep the original list order for deterministic resolution
+
+class Player:
+    """Holds the player's state. Slotted, since it is read and written many times every frame."""
+    __slots__ = (
+        "x", "y", "x_velocity", "y_velocity", "flags", "last_dash", "speed", "dash_speed",
+        "dash_cooldown", "dash_timer", "hp", "last_damage_time",
+    )
+
+    def __init__(self, x, y):
+        self.x = float(x)  # Position, kept as float scalars (as are the velocities)
+        self.y = float(y)
+        self.y_velocity = 0.0
+        self.x_velocity = 0.0
+        self.flags = FLAG_FACING_RIGHT  # FLAG_* state bits (default: facing right, nothing else set)
+        self.last_dash = 0  # Last dash timestamp
+        self.speed = PLAYER_STATS["speed"]  # Normal movement speed
+        self.dash_speed = float(PLAYER_STATS["dash_speed"])  # Dash speed
+        self.dash_cooldown = PLAYER_STATS["dash_cooldown"]  # Dash cooldown
+        self.dash_timer = 0  # Timer for dash duration
+        self.hp = 100  # Player's starting health
+        self.last_damage_time = 0  # Tracks the last time the player took damage
 
 class Camera:
     """A simple camera to follow the player within the world boundaries."""
     def __init__(self, world_width, world_height):
         self.camera = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)  # Viewport size
+        self.offset = (0, 0)  # World-to-screen translation, refreshed in update()
         self.world_width = world_width
         self.world_height = world_height
 
-    def apply(self, rect):
-        """Offset a rectangle's position by the camera's position."""
-        return rect.move(-self.camera.topleft[0], -self.camera.topleft[1])
+    def to_screen(self, rect):
+        """Returns the screen position of a world rectangle as an (x, y) tuple, without allocating a Rect."""
+        return rect.x + self.offset[0], rect.y + self.offset[1]
 
     def update(self, target):
         """Center the camera on the target (e.g., the player) while clamping to world borders."""
         x = max(0, min(target.centerx - WINDOW_WIDTH // 2, self.world_width - WINDOW_WIDTH))
         y = max(0, min(target.centery - WINDOW_HEIGHT // 2, self.world_height - WINDOW_HEIGHT))
-        self.camera = pygame.Rect(x, y, WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.camera.topleft = (x, y)  # Move the viewport in place
+        self.offset = (-x, -y)
     
-class Coin:
+class Coin(WorldSprite):
     """Represents a collectible coin in the game."""
     def __init__(self, x, y, size=10):
-        self.rect = pygame.Rect(x, y, size, size)
+        super().__init__(pygame.Rect(x, y, size, size), get_ellipse_surface((size, size), COLORS["coin"]))
         self.collected = False  # Tracks if the coin has been collected
 
-class DamageBrick:
+class DamageBrick(WorldSprite):
     """Represents a brick that damages the player on contact."""
     def __init__(self, x, y, width=50, height=50, damage=25):
-        self.rect = pygame.Rect(x, y, width, height)
+        super().__init__(pygame.Rect(x, y, width, height), get_solid_surface((width, height), COLORS["damage_brick"]))
         self.damage = damage
 
 
 # === Functions === #
-def apply_physics(player):
-    """Applies gravity and updates the player's position."""
-    if not player["is_dashing"]:  # Gravity only applies when not dashing
-        if not player["is_grounded"]:
-            player["y_velocity"] += GRAVITY  # Apply gravity
-            player["y_velocity"] = min(player["y_velocity"], MAX_FALL_SPEED)  # Cap falling speed
+@njit(cache=True)
+def step_physics(x, y, x_velocity, y_velocity, flags, dash_timer, platforms):
+    """Applies gravity, resolves platform collisions and keeps the player inside the world.
+
+    Runs as one compiled pass over plain numbers. platforms is an (N, 4) array of
+    (left, top, right, bottom) rows; the updated state is returned in argument order.
+    """
+    size = PLAYER_SIZE
+
+    # Physics: gravity only applies when not dashing
+    if not flags & FLAG_DASHING:
+        if not flags & FLAG_GROUNDED:
+            y_velocity += GRAVITY  # Apply gravity
+            y_velocity = min(y_velocity, MAX_FALL_SPEED)  # Cap falling speed
     else:
-        player["dash_timer"] -= 1  # Count down the dash timer
-        if player["dash_timer"] <= 0:  # Dash ends
-            player["is_dashing"] = False
-            player["x_velocity"] = 0  # Reset horizontal velocity after dashing
-
-    player["pos"][1] += player["y_velocity"]  # Update vertical position
-
-def constrain_player_to_world(player):
-    """Ensures the player stays within world boundaries (including skybox)."""
-    # Horizontal boundaries (left and right edges)
-    if player["pos"][0] < 0:
-        player["pos"][0] = 0
-        player["x_velocity"] = 0
-    elif player["pos"][0] > WORLD_WIDTH - PLAYER_STATS["size"]:
-        player["pos"][0] = WORLD_WIDTH - PLAYER_STATS["size"]
-        player["x_velocity"] = 0
-
-    # Vertical boundaries (floor and skybox)
-    if player["pos"][1] < SKYBOX_HEIGHT:  # Skybox constraint
-        player["pos"][1] = SKYBOX_HEIGHT
-        player["y_velocity"] = 0  # Stop upward movement
-    elif player["pos"][1] > WORLD_HEIGHT - PLAYER_STATS["size"]:  # Floor constraint
-        player["pos"][1] = WORLD_HEIGHT - PLAYER_STATS["size"]
-        player["y_velocity"] = 0  # Stop falling
-        player["is_grounded"] = True  # Consider player grounded on the floor
-
-def move_player(player, keys, delta_time):
-    """Moves the player based on input."""
-    if player["is_dashing"]:  # Ignore normal movement while dashing
-        player["pos"][0] += player["x_velocity"]
+        dash_timer -= 1  # Count down the dash timer
+        if dash_timer <= 0:  # Dash ends
+            flags &= ~FLAG_DASHING
+            x_velocity = 0.0  # Reset horizontal velocity after dashing
+
+    previous_y = y  # Position before this step, tells which side a platform was entered from
+    y += y_velocity  # Update vertical position
+
+    # Collisions: push the player out of each overlapping platform
+    flags &= ~FLAG_GROUNDED  # Reset grounded state
+
+    for index in range(platforms.shape[0]):
+        platform_left = float(platforms[index, 0])  # Integer bounds, compared against the float position
+        platform_top = float(platforms[index, 1])
+        platform_right = float(platforms[index, 2])
+        platform_bottom = float(platforms[index, 3])
+
+        # Overlap of the player and the platform along each axis
+        overlap_x = min(x + size, platform_right) - max(x, platform_left)
+        overlap_y = min(y + size, platform_bottom) - max(y, platform_top)
+        if overlap_x <= 0 or overlap_y <= 0:
+            continue  # Not touching this platform
+
+        # Swept checks: the side the player came from wins
+        if previous_y + size <= platform_top:  # Was above the platform: land on it
+            y = platform_top - size  # Snap to platform top
+            y_velocity = 0.0  # Stop vertical movement
+            flags |= FLAG_GROUNDED
+        elif previous_y >= platform_bottom:  # Was below the platform: head bump
+            y = platform_bottom  # Snap below the platform
+            y_velocity = 0.0  # Stop upward movement
+        elif overlap_y <= overlap_x:
+            # Already level with the platform, shallow vertical overlap: the centers decide the side
+            if 2 * y + size < platform_top + platform_bottom:
+                y = platform_top - size  # Step up onto the platform top
+                if y_velocity >= 0:  # Only counts as standing on it when not rising
+                    y_velocity = 0.0
+                    flags |= FLAG_GROUNDED
+            else:
+                y = platform_bottom  # Step down below the platform
+                if y_velocity < 0:
+                    y_velocity = 0.0
+        else:
+            # Horizontal: walking never sets x_velocity, so the centers decide the side
+            if 2 * x + size < platform_left + platform_right:
+                x = platform_left - size  # Snap to the left side
+            else:
+                x = platform_right  # Snap to the right side
+            x_velocity = 0.0  # Stop horizontal movement
+
+    # World boundaries: horizontal edges
+    if x < 0:
+        x = 0.0
+        x_velocity = 0.0
+    elif x > WORLD_WIDTH - size:
+        x = float(WORLD_WIDTH - size)
+        x_velocity = 0.0
+
+    # World boundaries: floor and skybox
+    if y < SKYBOX_HEIGHT:  # Skybox constraint
+        y = float(SKYBOX_HEIGHT)
+        y_velocity = 0.0  # Stop upward movement
+    elif y > WORLD_HEIGHT - size:  # Floor constraint
+        y = float(WORLD_HEIGHT - size)
+        y_velocity = 0.0  # Stop falling
+        flags |= FLAG_GROUNDED  # Consider player grounded on the floor
+
+    return x, y, x_velocity, y_velocity, flags, dash_timer
+
+def update_physics(player, platforms):
+    """Advances the player one physics step against the given (N, 4) platform array."""
+    (
+        player.x, player.y, player.x_velocity, player.y_velocity,
+        player.flags, player.dash_timer,
+    ) = step_physics(
+        player.x, player.y, player.x_velocity, player.y_velocity, player.flags, player.dash_timer, platforms,
+    )
+
+def move_player(player, keys, now, _jump_force=float(PLAYER_STATS["jump_force"])):
+    """Moves the player based on input (now is this frame's tick count in milliseconds)."""
+    if player.flags & FLAG_DASHING:  # Ignore normal movement while dashing
+        player.x += player.x_velocity
         return
 
-    speed = player["speed"]
+    speed = player.speed
+    left_held = keys[KEY_LEFT] or keys[KEY_LEFT_ALT]
+    right_held = keys[KEY_RIGHT] or keys[KEY_RIGHT_ALT]
 
     # Dash handling
-    if keys[pygame.K_LSHIFT]:  # Dash key is pressed
-        if not player.get("dash_key_pressed", False):  # Check if it's a new press
-            if pygame.time.get_ticks() - player["last_dash"] >= player["dash_cooldown"]:
+    if keys[KEY_DASH]:  # Dash key is pressed
+        if not player.flags & FLAG_DASH_KEY:  # Check if it's a new press
+            if now - player.last_dash >= player.dash_cooldown:
                 # Check if a movement key is being held
-                if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-                    player["is_dashing"] = True
-                    player["dash_timer"] = 15  # Dash lasts for 15 frames (adjust as needed)
-                    player["x_velocity"] = player["dash_speed"]
-                    player["facing_right"] = True  # Update facing direction
-                    player["last_dash"] = pygame.time.get_ticks()
-                elif keys[pygame.K_LEFT] or keys[pygame.K_a]:
-                    player["is_dashing"] = True
-                    player["dash_timer"] = 15  # Dash lasts for 15 frames (adjust as needed)
-                    player["x_velocity"] = -player["dash_speed"]
-                    player["facing_right"] = False  # Update facing direction
-                    player["last_dash"] = pygame.time.get_ticks()
-
-        player["dash_key_pressed"] = True  # Set the key as pressed
+                if right_held:
+                    player.flags |= FLAG_DASHING | FLAG_FACING_RIGHT  # Start dashing, facing right
+                    player.dash_timer = 15  # Dash lasts for 15 frames (adjust as needed)
+                    player.x_velocity = player.dash_speed
+                    player.last_dash = now
+                elif left_held:
+                    player.flags = (player.flags | FLAG_DASHING) & ~FLAG_FACING_RIGHT  # Start dashing, facing left
+                    player.dash_timer = 15  # Dash lasts for 15 frames (adjust as needed)
+                    player.x_velocity = -player.dash_speed
+                    player.last_dash = now
+
+        player.flags |= FLAG_DASH_KEY  # Set the key as pressed
     else:
-        player["dash_key_pressed"] = False  # Reset the key state when released
+        player.flags &= ~FLAG_DASH_KEY  # Reset the key state when released
 
     # Horizontal movement
-    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-        player["pos"][0] -= speed
-        player["facing_right"] = False  # Update facing direction
-    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-        player["pos"][0] += speed
-        player["facing_right"] = True  # Update facing direction
+    if left_held:
+        player.x -= speed
+        player.flags &= ~FLAG_FACING_RIGHT  # Update facing direction
+    if right_held:
+        player.x += speed
+        player.flags |= FLAG_FACING_RIGHT  # Update facing direction
 
     # Jumping
-    if keys[pygame.K_SPACE] and player["is_grounded"]:
-        player["y_velocity"] = PLAYER_STATS["jump_force"]  # Jump force
-
-
-
-def handle_collisions(player, platforms):
-    """Handles collisions between the player and platforms."""
-    player["is_grounded"] = False  # Reset grounded state
-
-    # Player's rectangle for collision detection
-    player_rect = pygame.Rect(player["pos"][0], player["pos"][1], PLAYER_STATS["size"], PLAYER_STATS["size"])
-    previous_bottom = player_rect.bottom - player["y_velocity"]  # Previous bottom position for swept collisions
-
-    for platform in platforms:
-        # Top collision (landing on a platform)
-        if (
-            previous_bottom <= platform.rect.top and
-            player_rect.bottom >= platform.rect.top and
-            player_rect.right > platform.rect.left and
-            player_rect.left < platform.rect.right and
-            player["y_velocity"] > 0
-        ):
-            player["pos"][1] = platform.rect.top - PLAYER_STATS["size"]  # Snap to platform top
-            player["y_velocity"] = 0  # Stop vertical movement
-            player["is_grounded"] = True
-            break  # Stop checking once grounded
-
-        # Bottom collision (head bumping into platform)
-        elif (
-            player_rect.top < platform.rect.bottom and
-            player_rect.top >= platform.rect.bottom - abs(player["y_velocity"]) and  # Swept collision logic
-            player_rect.right > platform.rect.left and
-            player_rect.left < platform.rect.right and
-            player["y_velocity"] < 0
-        ):
-            player["pos"][1] = platform.rect.bottom  # Snap below the platform
-            player["y_velocity"] = 0  # Stop upward movement
-
-        # Side collisions (prevent passing through platforms horizontally)
-        if (
-            player_rect.right > platform.rect.left and  # Right edge touches platform
-            player_rect.left < platform.rect.left and  # Moving into the left side
-            player_rect.bottom > platform.rect.top + 5 and  # Ignore collisions at the top edge
-            player_rect.top < platform.rect.bottom - 5  # Ignore collisions at the bottom edge
-        ):
-            player["pos"][0] = platform.rect.left - PLAYER_STATS["size"]  # Snap to the left side
-            player["x_velocity"] = 0  # Stop horizontal movement
-        elif (
-            player_rect.left < platform.rect.right and  # Left edge touches platform
-            player_rect.right > platform.rect.right and  # Moving into the right side
-            player_rect.bottom > platform.rect.top + 5 and  # Ignore collisions at the top edge
-            player_rect.top < platform.rect.bottom - 5  # Ignore collisions at the bottom edge
-        ):
-            player["pos"][0] = platform.rect.right  # Snap to the right side
-            player["x_velocity"] = 0  # Stop horizontal movement
-
-
-        # Bottom collision (head bumping into platform)
-        elif (
-            player_rect.top < platform.rect.bottom and
-            player_rect.top >= platform.rect.bottom - abs(player["y_velocity"]) and  # Swept collision check
-            player_rect.right > platform.rect.left and
-            player_rect.left < platform.rect.right and
-            player["y_velocity"] < 0
-        ):
-            player["pos"][1] = platform.rect.bottom  # Snap below the platform
-            player["y_velocity"] = 0  # Stop upward movement
-
-def draw_borders(screen, camera):
-    """Draws the borders of the world."""
+    if keys[KEY_JUMP] and player.flags & FLAG_GROUNDED:
+        player.y_velocity = _jump_force  # Jump force
+
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    """Returns the default font at the given size, created only once (needs pygame.init())."""
+    return pygame.font.SysFont(None, size)
+
+@functools.lru_cache(maxsize=128)
+def render_text(font, text, color):
+    """Renders anti-aliased text, reusing the surface when the same string is drawn again."""
+    return font.render(text, True, color)
+
+@functools.lru_cache(maxsize=None)
+def get_solid_surface(size, color):
+    """Returns a display-format surface of the given size filled with color, created once per pair."""
+    surface = pygame.Surface(size).convert()  # Native pixel format, so blitting is a plain copy
+    surface.fill(color)
+    return surface
+
+@functools.lru_cache(maxsize=None)
+def get_ellipse_surface(size, color):
+    """Returns a transparent surface with an ellipse filling it, created once per (size, color)."""
+    surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    pygame.draw.ellipse(surface, color, surface.get_rect())
+    return surface
+
+def create_border_sprites():
+    """Creates the sprites for the borders of the world."""
     top_border = pygame.Rect(0, 0, WORLD_WIDTH, BORDER_THICKNESS)
     bottom_border = pygame.Rect(0, WORLD_HEIGHT - BORDER_THICKNESS, WORLD_WIDTH, BORDER_THICKNESS)
     left_border = pygame.Rect(0, 0, BORDER_THICKNESS, WORLD_HEIGHT)
     right_border = pygame.Rect(WORLD_WIDTH - BORDER_THICKNESS, 0, BORDER_THICKNESS, WORLD_HEIGHT)
 
-    pygame.draw.rect(screen, COLORS["border"], camera.apply(top_border))
-    pygame.draw.rect(screen, COLORS["border"], camera.apply(bottom_border))
-    pygame.draw.rect(screen, COLORS["border"], camera.apply(left_border))
-    pygame.draw.rect(screen, COLORS["border"], camera.apply(right_border))
+    borders = (top_border, bottom_border, left_border, right_border)
+    return [WorldSprite(border, get_solid_surface(border.size, COLORS["border"])) for border in borders]
+
+def scroll_sprites(camera, world_sprites, sprite_grid, shown_sprites):
+    """Moves the world sprites inside the viewport to their new screen positions.
+
+    Only sprites near the viewport (looked up in sprite_grid) are touched. Sprites from
+    shown_sprites that left the viewport are hidden. Returns the set of sprites now shown.
+    """
+    viewport = camera.camera
+    now_shown = set()
+    for index in sprite_grid.query(viewport):
+        sprite = world_sprites[index]
+        if sprite.world_rect.colliderect(viewport):
+            sprite.rect.topleft = camera.to_screen(sprite.world_rect)
+            sprite.visible = 1
+            now_shown.add(sprite)
+    for sprite in shown_sprites - now_shown:
+        sprite.visible = 0
+    return now_shown
 
 def draw_velocity_bars(screen, player):
     """Draws X and Y velocity bars at the top-left of the screen."""
@@ -230,23 +368,23 @@ def draw_velocity_bars(screen, player):
     max_velocity = 20  # Max absolute velocity value for scaling
 
     # X Velocity Bar
-    x_velocity_ratio = player["x_velocity"] / max_velocity  # Scale between -1 and 1
+    x_velocity_ratio = player.x_velocity / max_velocity  # Scale between -1 and 1
     x_bar_length = int(bar_width * abs(x_velocity_ratio))  # Bar length proportional to velocity
     x_bar_color = (0, 255, 0) if x_velocity_ratio >= 0 else (255, 0, 0)  # Green for positive, red for negative
     x_bar_pos = (10, 10)  # Position of X bar
     pygame.draw.rect(screen, x_bar_color, (*x_bar_pos, x_bar_length, bar_height))  # Draw the bar
 
     # Y Velocity Bar
-    y_velocity_ratio = player["y_velocity"] / max_velocity  # Scale between -1 and 1
+    y_velocity_ratio = player.y_velocity / max_velocity  # Scale between -1 and 1
     y_bar_length = int(bar_width * abs(y_velocity_ratio))  # Bar length proportional to velocity
     y_bar_color = (0, 255, 0) if y_velocity_ratio >= 0 else (255, 0, 0)  # Green for positive, red for negative
     y_bar_pos = (10, 40)  # Position of Y bar
     pygame.draw.rect(screen, y_bar_color, (*y_bar_pos, y_bar_length, bar_height))  # Draw the bar
 
     # Labels for debugging
-    font = pygame.font.SysFont(None, 24)
-    x_label = font.render(f"X Velocity: {player['x_velocity']:.1f}", True, (255, 255, 255))
-    y_label = font.render(f"Y Velocity: {player['y_velocity']:.1f}", True, (255, 255, 255))
+    font = get_font(24)
+    x_label = render_text(font, f"X Velocity: {player.x_velocity:.1f}", (255, 255, 255))
+    y_label = render_text(font, f"Y Velocity: {player.y_velocity:.1f}", (255, 255, 255))
     screen.blit(x_label, (10, 10 + bar_height + 5))  # Position X label below the bar
     screen.blit(y_label, (10, 40 + bar_height + 5))  # Position Y label below the bar
 
@@ -256,62 +394,81 @@ def load_level(filename):
         level_data = json.load(file)
     return level_data["platforms"]
 
-def handle_coin_collection(player, coins, score):
-    """Check for collisions between the player and coins."""
-    player_rect = pygame.Rect(player["pos"][0], player["pos"][1], PLAYER_STATS["size"], PLAYER_STATS["size"])
-    for coin in coins:
-        if not coin.collected and player_rect.colliderect(coin.rect):
-            coin.collected = True  # Mark coin as collected
-            score += 1  # Increment the score
+def rect_bounds(rects):
+    """Packs rects into a contiguous int32 (N, 4) array of (left, top, right, bottom) rows."""
+    return np.array([(rect.left, rect.top, rect.right, rect.bottom) for rect in rects], dtype=np.int32).reshape(-1, 4)
+
+def overlap_mask(bounds, rect):
+    """Returns a boolean mask of the (left, top, right, bottom) bounds rows that overlap rect."""
+    return (
+        (bounds[:, 0] < rect.right) & (bounds[:, 2] > rect.left) &
+        (bounds[:, 1] < rect.bottom) & (bounds[:, 3] > rect.top)
+    )
+
+def handle_coin_collection(player_rect, coins, coin_bounds, coins_collected, score):
+    """Check for collisions between the player and coins (coins_collected is updated in place)."""
+    hits = overlap_mask(coin_bounds, player_rect) & ~coins_collected  # Only uncollected coins count
+    if hits.any():
+        coins_collected |= hits
+        for index in np.flatnonzero(hits):
+            coins[index].collected = True  # Mark coin as collected
+            coins[index].kill()  # Stop drawing it
+        score += int(hits.sum())  # Increment the score
     return score
 
-def handle_damage(player, amount):
-    """Reduces the player's HP by the given amount."""
-    player["hp"] -= amount
-    if player["hp"] < 0:
-        player["hp"] = 0  # Ensure HP doesn't go below 0
-
 def draw_health_bar(screen, player):
     """Draws the player's health bar on the screen."""
     bar_width = 200
     bar_height = 20
-    hp_ratio = player["hp"] / 100  # Scale HP between 0 and 1
+    hp_ratio = player.hp / 100  # Scale HP between 0 and 1
     hp_bar_color = (255, 0, 0)  # Red for the health bar
 
     pygame.draw.rect(screen, hp_bar_color, (10, 40, int(bar_width * hp_ratio), bar_height))  # Draw HP bar
-    font = pygame.font.SysFont(None, 24)
-    hp_text = font.render(f"HP: {player['hp']}", True, (255, 255, 255))
+    font = get_font(24)
+    hp_text = render_text(font, f"HP: {player.hp}", (255, 255, 255))
     screen.blit(hp_text, (10, 40 + bar_height + 5))  # Text below the health bar
 
-def handle_damage_bricks(player, damage_bricks):
+def draw_hud(surface, font, player, score):
+    """Redraws the score and health bar onto the transparent HUD surface."""
+    surface.fill((255, 255, 255, 0))  # Transparent white, so the anti-aliased white text blends as if drawn on screen
+    score_text = render_text(font, f"Score: {score}", (255, 255, 255))
+    surface.blit(score_text, (10, 10))  # Top-left corner
+    draw_health_bar(surface, player)  # Display health bar
+
+def handle_damage_bricks(player, player_rect, damage_bricks, brick_bounds, now):
     """Checks for collisions with damage bricks and applies damage."""
-    player_rect = pygame.Rect(player["pos"][0], player["pos"][1], PLAYER_STATS["size"], PLAYER_STATS["size"])
-    for brick in damage_bricks:
-        if player_rect.colliderect(brick.rect):
-            handle_damage(player, brick.damage)  # Apply damage to the player
+    for index in np.flatnonzero(overlap_mask(brick_bounds, player_rect)):
+        handle_damage(player, damage_bricks[index].damage, now)  # Apply damage to the player
 
-def handle_damage(player, amount):
+def handle_damage(player, amount, now):
     """Reduces the player's HP by the given amount if not invincible."""
-    current_time = pygame.time.get_ticks()
-    if not player["is_invincible"]:  # Only apply damage if not invincible
-        player["hp"] -= amount
-        if player["hp"] < 0:
-            player["hp"] = 0  # Ensure HP doesn't go below 0
-        player["is_invincible"] = True  # Activate invincibility
-        player["last_damage_time"] = current_time  # Record the time of damage
+    if not player.flags & FLAG_INVINCIBLE:  # Only apply damage if not invincible
+        player.hp -= amount
+        if player.hp < 0:
+            player.hp = 0  # Ensure HP doesn't go below 0
+        player.flags |= FLAG_INVINCIBLE  # Activate invincibility
+        player.last_damage_time = now  # Record the time of damage
 
 
 
 
 # === Database === #
+_db_connection = None  # Shared connection, opened on first use
+_top_scores_cache = None  # Cached leaderboard rows, cleared whenever a score is saved
+_top_scores_time = 0.0  # time.monotonic() of the last leaderboard query
+TOP_SCORES_MAX_AGE = 1.0  # Seconds before the cache is re-read anyway (e.g. scores from another instance)
+
+def get_db_connection():
+    """Returns the shared connection to score.db, opening it in WAL mode on first use."""
+    global _db_connection
+    if _db_connection is None:
+        _db_connection = sqlite3.connect(DB_PATH, isolation_level=None)  # Autocommit mode
+        _db_connection.execute('PRAGMA journal_mode=WAL')  # Writers append to a log instead of rewriting the file
+        _db_connection.execute('PRAGMA synchronous=NORMAL')  # No fsync on every commit (safe with WAL)
+    return _db_connection
+
 def initialize_database():
-    # Get the directory where the script is located
-    script_dir = os.path.dirname(__file__)  # Directory of the running script
-    db_path = os.path.join(script_dir, 'score.db')  # Full path to score.db in the same directory
-    
-    conn = sqlite3.connect(db_path)  # Create or open score.db at the specified path
-    cursor = conn.cursor()
-    cursor.execute('''
+    get_db_connection().execute('''
         CREATE TABLE IF NOT EXISTS scores (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             player_name TEXT NOT NULL,
@@ -319,32 +476,22 @@ def initialize_database():
             date TEXT NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
 
 def save_score(player_name, score):
-    from datetime import datetime
-    script_dir = os.path.dirname(__file__)  # Directory of the running script
-    db_path = os.path.join(script_dir, 'score.db')  # Full path to score.db
-    
-    conn = sqlite3.connect(db_path)  # Connect to the database at the specified path
-    cursor = conn.cursor()
+    global _top_scores_cache
     date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Current timestamp
-    cursor.execute('INSERT INTO scores (player_name, score, date) VALUES (?, ?, ?)', (player_name, score, date))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute('INSERT INTO scores (player_name, score, date) VALUES (?, ?, ?)', (player_name, score, date))
+    _top_scores_cache = None  # The leaderboard may have changed
 
 def get_top_scores():
-    """Fetches the top 3 scores from the database."""
-    script_dir = os.path.dirname(__file__)  # Directory of the running script
-    db_path = os.path.join(script_dir, 'score.db')  # Full path to score.db
-    
-    conn = sqlite3.connect(db_path)  # Connect to the database
-    cursor = conn.cursor()
-    cursor.execute('SELECT player_name, score FROM scores ORDER BY score DESC LIMIT 3')
-    top_scores = cursor.fetchall()  # Fetch the top 3 scores
-    conn.close()
-    return top_scores
+    """Fetches the top 3 scores from the database (cached until a score is saved, at most one second)."""
+    global _top_scores_cache, _top_scores_time
+    now = time.monotonic()
+    if _top_scores_cache is None or now - _top_scores_time > TOP_SCORES_MAX_AGE:
+        _top_scores_time = now
+        cursor = get_db_connection().execute('SELECT player_name, score FROM scores ORDER BY score DESC LIMIT 3')
+        _top_scores_cache = cursor.fetchall()  # Fetch the top 3 scores
+    return _top_scores_cache
 
 def draw_leaderboard(screen, font):
     """Displays the top 3 scores on the screen."""
@@ -352,11 +499,11 @@ def draw_leaderboard(screen, font):
     leaderboard_x = 10
     leaderboard_y = 70  # Position below the health bar
 
-    title_text = font.render("Leaderboard:", True, (255, 255, 255))  # Title
+    title_text = render_text(font, "Leaderboard:", (255, 255, 255))  # Title
     screen.blit(title_text, (leaderboard_x, leaderboard_y))  # Render title
 
     for i, (player_name, score) in enumerate(top_scores):
-        score_text = font.render(f"{i + 1}. {player_name}: {score}", True, (255, 255, 255))
+        score_text = render_text(font, f"{i + 1}. {player_name}: {score}", (255, 255, 255))
         screen.blit(score_text, (leaderboard_x, leaderboard_y + 30 * (i + 1)))  # Offset each entry
 
 
@@ -366,7 +513,7 @@ def draw_leaderboard(screen, font):
 def main_menu():
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    font = pygame.font.SysFont(None, 36)
+    font = get_font(36)
     clock = pygame.time.Clock()
 
     # Menu variables
@@ -402,22 +549,22 @@ def main_menu():
 
         # Draw input field
         pygame.draw.rect(screen, (255, 255, 255), input_rect, 2)  # White border
-        name_text = font.render(player_name, True, (255, 255, 255))  # Render the player's name
+        name_text = render_text(font, player_name, (255, 255, 255))  # Render the player's name
         screen.blit(name_text, (input_rect.x + 10, input_rect.y + 10))  # Position text within input field
 
         # Draw Play button
         pygame.draw.rect(screen, (0, 255, 0), play_button_rect)  # Green button
-        play_text = font.render("Play", True, (0, 0, 0))  # Black "Play" text
+        play_text = render_text(font, "Play", (0, 0, 0))  # Black "Play" text
         screen.blit(play_text, (play_button_rect.x + 40, play_button_rect.y + 10))  # Center text on button
 
         # Draw leaderboard
-        top_scores = get_top_scores()  # Fetch top 3 scores from the database
+        top_scores = get_top_scores()  # Top 3 scores, re-queried at most once per second
         leaderboard_x = WINDOW_WIDTH // 2 - 150
         leaderboard_y = WINDOW_HEIGHT // 2 + 120
-        title_text = font.render("Leaderboard:", True, (255, 255, 255))  # Title
+        title_text = render_text(font, "Leaderboard:", (255, 255, 255))  # Title
         screen.blit(title_text, (leaderboard_x, leaderboard_y))  # Render title
         for i, (name, score) in enumerate(top_scores):
-            score_text = font.render(f"{i + 1}. {name}: {score}", True, (255, 255, 255))
+            score_text = render_text(font, f"{i + 1}. {name}: {score}", (255, 255, 255))
             screen.blit(score_text, (leaderboard_x, leaderboard_y + 30 * (i + 1)))  # Offset each entry
 
         pygame.display.flip()
@@ -435,23 +582,7 @@ def main(player_name):
     camera = Camera(WORLD_WIDTH, WORLD_HEIGHT)
 
     # Player setup
-    player = {
-        "pos": PLAYER_STATS["start_pos"][:],  # Starting position (copy)
-        "y_velocity": 0,
-        "x_velocity": 0,
-        "is_grounded": False,
-        "last_dash": 0,  # Last dash timestamp
-        "speed": PLAYER_STATS["speed"],  # Normal movement speed
-        "dash_speed": PLAYER_STATS["dash_speed"],  # Dash speed
-        "dash_cooldown": PLAYER_STATS["dash_cooldown"],  # Dash cooldown
-        "is_dashing": False,  # Tracks if player is currently dashing
-        "dash_timer": 0,      # Timer for dash duration
-        "facing_right": True, # Tracks last facing direction (default: right)
-        "dash_key_pressed": False,  # Tracks dash key state
-        "hp": 100,  # Player's starting health
-        "is_invincible": False,  # Tracks whether the player is invincible
-        "last_damage_time": 0,   # Tracks the last time the player took damage
-    }
+    player = Player(*PLAYER_STATS["start_pos"])
 
     # Initialize coins and score
     coins = [
@@ -461,7 +592,7 @@ def main(player_name):
         Coin(700, 200)
     ]
     score = 0  # Start score at 0
-    font = pygame.font.SysFont(None, 36)  # Font for displaying score
+    font = get_font(36)  # Font for displaying score
 
     # Load platforms from JSON
     platforms_data = load_level(LEVEL_PATH)
@@ -472,21 +603,51 @@ def main(player_name):
         DamageBrick(200, 150)  # Brick at (200, 150) with 25 damage
     ]
 
+    # Static objects never move, so their collision data is built once
+    platform_rects = [platform.world_rect for platform in platforms]
+    platform_grid = SpatialHashGrid(platform_rects)
+    platform_bounds = rect_bounds(platform_rects)
+    coin_bounds = rect_bounds([coin.world_rect for coin in coins])
+    coins_collected = np.zeros(len(coins), dtype=bool)  # Parallel to coin_bounds
+    brick_bounds = rect_bounds([brick.world_rect for brick in damage_bricks])
+
+    # Player's rectangle, moved in place every frame instead of reallocated
+    player_rect = pygame.Rect(0, 0, PLAYER_STATS["size"], PLAYER_STATS["size"])
+
+    # Sprites, in drawing order; only the player is redrawn every frame, the world when the camera scrolls
+    player_sprite = pygame.sprite.DirtySprite()
+    player_sprite.rect = player_rect.copy()  # Screen position
+    border_sprites = create_border_sprites()
+    world_sprites = border_sprites + platforms + coins + damage_bricks
+    sprite_grid = SpatialHashGrid([sprite.world_rect for sprite in world_sprites])
+    shown_sprites = set()  # World sprites currently inside the viewport
+
+    # The HUD is a sprite on top of everything, re-rendered only when the score or HP changes
+    hud_sprite = pygame.sprite.DirtySprite()
+    hud_sprite.image = pygame.Surface(HUD_AREA[2:], pygame.SRCALPHA).convert_alpha()
+    hud_sprite.rect = pygame.Rect(HUD_AREA)
+    hud_state = None  # (hp, score) currently shown on the HUD surface
+
+    sprites = pygame.sprite.LayeredDirty(border_sprites, player_sprite, platforms, coins, damage_bricks, hud_sprite)
+    sprites.clear(screen, get_solid_surface((WINDOW_WIDTH, WINDOW_HEIGHT), COLORS["background"]))
+    screen_rect = screen.get_rect()
+
     # Game state variables
     game_over = False
     game_over_time = None
     score_saved = False  # Tracks if the score has already been saved
 
+    previous_camera_offset = None  # Camera offset of the last drawn frame (None forces a full repaint)
+
     running = True
     while running:
-        delta_time = clock.tick(60)
+        clock.tick(60)
+        now = pygame.time.get_ticks()  # Single timestamp shared by everything this frame
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        # Handle game over state
-        # Handle game over state
         # Handle game over state
         if game_over:
             # Save the player's score only once
@@ -495,13 +656,13 @@ def main(player_name):
                 score_saved = True  # Mark the score as saved
 
             # Check if 5 seconds have passed since the game ended
-            if pygame.time.get_ticks() - game_over_time > 5000:  # 5 seconds in milliseconds
+            if now - game_over_time > 5000:  # 5 seconds in milliseconds
                 running = False  # Exit the game
             else:
                 # Display the death screen
                 screen.fill((0, 0, 0))  # Black background
-                death_text = font.render("Game Over", True, (255, 0, 0))  # Red "Game Over" text
-                score_text = font.render(f"Score: {score}", True, (255, 255, 255))  # White score text
+                death_text = render_text(font, "Game Over", (255, 0, 0))  # Red "Game Over" text
+                score_text = render_text(font, f"Score: {score}", (255, 255, 255))  # White score text
                 screen.blit(death_text, (WINDOW_WIDTH // 2 - death_text.get_width() // 2, WINDOW_HEIGHT // 2 - 50))
                 screen.blit(score_text, (WINDOW_WIDTH // 2 - score_text.get_width() // 2, WINDOW_HEIGHT // 2 + 10))
                 pygame.display.flip()
@@ -509,62 +670,54 @@ def main(player_name):
 
         # Handle input and movement
         keys = pygame.key.get_pressed()
-        move_player(player, keys, delta_time)
+        move_player(player, keys, now)
 
-        # Apply physics and handle collisions
-        apply_physics(player)
-        handle_collisions(player, platforms)
-        constrain_player_to_world(player)
+        # Apply physics and handle collisions against the platforms near the player
+        player_rect.topleft = (int(player.x), int(player.y))  # Truncate like pygame.Rect()
+        nearby = platform_grid.query(player_rect, margin=MAX_FALL_SPEED)  # Covers this frame's fall or jump
+        update_physics(player, platform_bounds[nearby])
+        player_rect.topleft = (int(player.x), int(player.y))  # Sync with the resolved position
 
         # Check for player death based on HP
-        if player["hp"] <= 0:
+        if player.hp <= 0:
             game_over = True
-            game_over_time = pygame.time.get_ticks()  # Record the time when the game ended
+            game_over_time = now  # Record the time when the game ended
             continue
 
         # Check for collisions with damage bricks
-        handle_damage_bricks(player, damage_bricks)
+        handle_damage_bricks(player, player_rect, damage_bricks, brick_bounds, now)
 
         # Reset invincibility after 1 second
-        if player["is_invincible"]:
-            if pygame.time.get_ticks() - player["last_damage_time"] > 1000:  # 1 second (1000 ms)
-                player["is_invincible"] = False
+        if player.flags & FLAG_INVINCIBLE:
+            if now - player.last_damage_time > 1000:  # 1 second (1000 ms)
+                player.flags &= ~FLAG_INVINCIBLE
 
         # Check for coin collection
-        score = handle_coin_collection(player, coins, score)
+        score = handle_coin_collection(player_rect, coins, coin_bounds, coins_collected, score)
 
-        # Update the camera
-        player_rect = pygame.Rect(player["pos"][0], player["pos"][1], PLAYER_STATS["size"], PLAYER_STATS["size"])
+        # Update the camera; scrolling moves every world sprite, so the whole screen is repainted
         camera.update(player_rect)
-
-        # Drawing
-        screen.fill(COLORS["background"])  # Clear screen
-        draw_borders(screen, camera)  # Draw borders
-
-        # Draw platforms, coins, damage bricks, and player
-        player_camera_rect = camera.apply(player_rect)
-        if player["is_invincible"] and pygame.time.get_ticks() % 200 < 100:  # Flash effect
-            pygame.draw.rect(screen, (255, 255, 0), player_camera_rect)  # Yellow for invincibility
+        if camera.offset != previous_camera_offset:
+            shown_sprites = scroll_sprites(camera, world_sprites, sprite_grid, shown_sprites)
+            sprites.repaint_rect(screen_rect)
+            previous_camera_offset = camera.offset
+
+        # Player sprite
+        if player.flags & FLAG_INVINCIBLE and now % 200 < 100:  # Flash effect
+            player_sprite.image = get_solid_surface(player_rect.size, COLORS["invincible"])
         else:
-            pygame.draw.rect(screen, COLORS["player"], player_camera_rect)  # Normal color
-
-        for platform in platforms:
-            platform_camera_rect = camera.apply(platform.rect)
-            pygame.draw.rect(screen, COLORS["platform"], platform_camera_rect)  # Draw platform
-        for coin in coins:
-            if not coin.collected:  # Only draw uncollected coins
-                coin_camera_rect = camera.apply(coin.rect)
-                pygame.draw.ellipse(screen, (255, 215, 0), coin_camera_rect)  # Gold-colored coins
-        for brick in damage_bricks:
-            brick_camera_rect = camera.apply(brick.rect)
-            pygame.draw.rect(screen, (255, 0, 0), brick_camera_rect)  # Red damage brick
-
-        # Render the score and health bar on the screen
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        screen.blit(score_text, (10, 10))  # Top-left corner
-        draw_health_bar(screen, player)  # Display health bar
-
-        pygame.display.flip()
+            player_sprite.image = get_solid_surface(player_rect.size, COLORS["player"])
+        player_sprite.rect.topleft = camera.to_screen(player_rect)
+        player_sprite.dirty = 1
+
+        # HUD sprite
+        if (player.hp, score) != hud_state:
+            hud_state = (player.hp, score)
+            draw_hud(hud_sprite.image, font, player, score)
+            hud_sprite.dirty = 1
+
+        # Draw and present only what changed
+        pygame.display.update(sprites.draw(screen))
 
     pygame.quit()
 